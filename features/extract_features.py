@@ -1,11 +1,22 @@
 from __future__ import annotations
 
 import argparse
+from concurrent.futures import ProcessPoolExecutor
 import csv
+import os
+import re
 from pathlib import Path
-from typing import Dict, List
+from typing import TYPE_CHECKING, Dict, Iterator, List, Set, Tuple
 
-import pandas as pd
+import numpy as np
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 SYSCALL_KEYWORDS = {
@@ -43,40 +54,174 @@ DELETED_KEYWORDS = [
 ]
 
 
-def parse_strace_file(path: Path) -> Dict[str, int]:
-    counts = {
-        "open_count": 0,
-        "read_count": 0,
-        "write_count": 0,
-        "execve_count": 0,
-        "connect_count": 0,
-        "fork_count": 0,
-        "clone_count": 0,
-        "created_count": 0,
-        "deleted_count": 0,
-    }
+BUCKET_KEYWORDS: Dict[str, List[str]] = {
+    **SYSCALL_KEYWORDS,
+    "created_count": CREATED_KEYWORDS,
+    "deleted_count": DELETED_KEYWORDS,
+}
+
+
+def _invert_bucket_keywords() -> Dict[str, Tuple[str, ...]]:
+    kw_to_buckets: Dict[str, List[str]] = {}
+    for key, keywords in BUCKET_KEYWORDS.items():
+        for keyword in keywords:
+            kw_to_buckets.setdefault(keyword, []).append(key)
+    return {keyword: tuple(keys) for keyword, keys in kw_to_buckets.items()}
+
+
+# Every keyword mapped to all the buckets it feeds, e.g. "unlink" ->
+# ("created_count", "deleted_count"); the single source for scanners that
+# walk keywords rather than buckets.
+_KW_TO_BUCKETS = _invert_bucket_keywords()
+
+FEATURE_COLUMNS = [
+    "open_count",
+    "read_count",
+    "write_count",
+    "execve_count",
+    "connect_count",
+    "fork_count",
+    "clone_count",
+    "created_count",
+    "deleted_count",
+    "new_process_count",
+]
+
+_FEATURE_INDEX = {name: i for i, name in enumerate(FEATURE_COLUMNS)}
+
+OUTPUT_COLUMNS = ["id", "label", *FEATURE_COLUMNS]
+
+# Column dtypes for feature frames, shared with readers of the CSV.
+COLUMN_DTYPES = {"id": "string", "label": "string"} | {
+    column: "uint32" for column in FEATURE_COLUMNS
+}
+
+# Below this many files, worker start-up costs more than it saves.
+PARALLEL_MIN_FILES = 8
+
+
+# UTF-8 encodings of everything str.strip() treats as whitespace (U+3000
+# is the highest), so a comment indented with e.g. a no-break space is
+# still skipped when the log is scanned as raw bytes.
+_LEADING_SPACE = b"|".join(
+    re.escape(chr(code).encode("utf-8"))
+    for code in range(0x3001)
+    if chr(code).isspace() and chr(code) not in "\r\n"
+)
+
+
+def _compile_bucket_pattern(keywords: List[str]) -> re.Pattern[bytes]:
+    # A line is counted at most once, so a keyword that contains another
+    # one from the same bucket ("unlink" vs "link") adds nothing.
+    keywords = [
+        keyword
+        for keyword in keywords
+        if not any(other != keyword and other in keyword for other in keywords)
+    ]
+    alternation = b"|".join(re.escape(keyword.encode("ascii")) for keyword in keywords)
+    # Leading with the keyword keeps the engine on its fast literal search,
+    # and swallowing the rest of the line means each line matches at most
+    # once. The empty group stops findall() from copying matched text out
+    # of the buffer.
+    return re.compile(rb"(?:" + alternation + rb")[^\n]*()")
+
+
+_BUCKET_PATTERNS = {
+    key: _compile_bucket_pattern(keywords) for key, keywords in BUCKET_KEYWORDS.items()
+}
+
+
+def _build_automaton():
+    # One automaton over every keyword, each tagged with the buckets it
+    # feeds; built once at import so per-file cost is a single pass.
+    automaton = ahocorasick.Automaton()
+    for keyword, keys in _KW_TO_BUCKETS.items():
+        automaton.add_word(keyword, keys)
+    automaton.make_automaton()
+    return automaton
+
+
+_AUTOMATON = _build_automaton() if ahocorasick is not None else None
+
+# Led by the newline rather than anchored with ^ and re.M, so the engine
+# jumps between line starts instead of trying every offset.
+_COMMENT_LINE = re.compile(rb"\n(?:" + _LEADING_SPACE + rb")*#[^\n]*")
+
+
+def _drop_comment_lines(data: bytes) -> bytes:
+    # One C-level pass; the leading newline lets the first line match too,
+    # and each comment becomes a blank line, which counts for nothing.
+    return _COMMENT_LINE.sub(b"\n", b"\n" + data)
 
-    with path.open("r", encoding="utf-8") as handle:
-        for raw_line in handle:
-            line = raw_line.strip()
-            if not line or line.startswith("#"):
-                continue
-            line_lower = line.lower()
 
-            for key, keywords in SYSCALL_KEYWORDS.items():
-                if any(keyword in line_lower for keyword in keywords):
-                    counts[key] += 1
+def _scan_automaton(data: bytes) -> Dict[str, int]:
+    # latin-1 maps bytes 1:1 onto str, which the automaton requires. Hits
+    # arrive in text order, so a bucket counts a line only on the first hit
+    # before that line's newline.
+    text = data.decode("latin-1")
+    counts = dict.fromkeys(BUCKET_KEYWORDS, 0)
+    line_end = -1
+    counted: Set[str] = set()
+    for end, keys in _AUTOMATON.iter(text):
+        if end > line_end:
+            line_end = text.find("\n", end)
+            if line_end < 0:
+                line_end = len(text)
+            counted.clear()
+        for key in keys:
+            if key not in counted:
+                counted.add(key)
+                counts[key] += 1
+    return counts
+
 
-            if any(keyword in line_lower for keyword in CREATED_KEYWORDS):
-                counts["created_count"] += 1
+def _scan_buckets(data: bytes) -> Dict[str, int]:
+    if _AUTOMATON is not None:
+        return _scan_automaton(data)
+    return {
+        key: len(pattern.findall(data)) for key, pattern in _BUCKET_PATTERNS.items()
+    }
 
-            if any(keyword in line_lower for keyword in DELETED_KEYWORDS):
-                counts["deleted_count"] += 1
 
+def _count_buckets(data: bytes) -> Dict[str, int]:
+    counts = _scan_buckets(data)
     counts["new_process_count"] = counts["fork_count"] + counts["clone_count"]
     return counts
 
 
+def _read_log(path: Path | str) -> bytes:
+    # Lowercase the whole buffer once (ASCII only, in C) and match it
+    # case-sensitively: IGNORECASE or [oO]-style patterns cost the engine
+    # its literal search and run several times slower than this extra pass.
+    with open(path, "rb") as handle:
+        data = handle.read().lower()
+    # Text-mode reads ended lines at \r, \n or \r\n. Folding \r into \n
+    # keeps that, and a single-byte [^\n] class scans about twice as fast
+    # as [^\r\n]; the blank lines a \r\n leaves behind match nothing.
+    if b"\r" in data:
+        data = data.replace(b"\r", b"\n")
+    # Most logs hold no "#" at all, so skip even the comment pass for them.
+    if b"#" in data:
+        data = _drop_comment_lines(data)
+    return data
+
+
+def parse_strace_file(path: Path | str) -> Dict[str, int]:
+    return _count_buckets(_read_log(path))
+
+
+def parse_strace_file_vector(path: Path | str) -> np.ndarray:
+    # Same counts as parse_strace_file, laid out in FEATURE_COLUMNS order
+    # for callers that feed the model directly.
+    vec = np.zeros(len(FEATURE_COLUMNS), dtype=np.uint32)
+    for key, count in _scan_buckets(_read_log(path)).items():
+        vec[_FEATURE_INDEX[key]] = count
+    vec[_FEATURE_INDEX["new_process_count"]] = (
+        vec[_FEATURE_INDEX["fork_count"]] + vec[_FEATURE_INDEX["clone_count"]]
+    )
+    return vec
+
+
 def load_labels(path: Path) -> Dict[str, str]:
     labels: Dict[str, str] = {}
 
@@ -93,43 +238,102 @@ def load_labels(path: Path) -> Dict[str, str]:
     return labels
 
 
-def extract_features(input_dir: Path, labels_path: Path) -> pd.DataFrame:
-    labels = load_labels(labels_path)
-    records: List[Dict[str, int | str]] = []
+def _iter_strace(root: str) -> List[str]:
+    # os.scandir hands back plain strings and cached d_type info, so the
+    # walk needs neither a Path object nor a stat() per entry.
+    stack = [root]
+    found: List[str] = []
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.name.endswith(".strace"):
+                    found.append(entry.path)
+    return found
 
-    strace_files = sorted(input_dir.rglob("*.strace"))
+
+def _list_labelled_files(
+    input_dir: Path, labels: Dict[str, str]
+) -> List[Tuple[str, str]]:
+    strace_files = _iter_strace(str(input_dir))
     if not strace_files:
         raise FileNotFoundError(
             f"No .strace files found under '{input_dir.as_posix()}'."
         )
 
-    for strace_file in strace_files:
-        file_id = strace_file.stem
+    # Sorted by id up front so rows can be streamed out already in order.
+    files = sorted(
+        (os.path.splitext(os.path.basename(strace_file))[0], strace_file)
+        for strace_file in strace_files
+    )
+    for file_id, _ in files:
         if file_id not in labels:
             raise KeyError(f"No label found for '{file_id}' in labels CSV.")
+    return files
 
-        counts = parse_strace_file(strace_file)
-        counts["id"] = file_id
-        counts["label"] = labels[file_id]
-        records.append(counts)
-
-    df = pd.DataFrame.from_records(records)
-    ordered_columns = [
-        "id",
-        "label",
-        "open_count",
-        "read_count",
-        "write_count",
-        "execve_count",
-        "connect_count",
-        "fork_count",
-        "clone_count",
-        "created_count",
-        "deleted_count",
-        "new_process_count",
-    ]
-    df = df[ordered_columns].sort_values("id").reset_index(drop=True)
-    return df
+
+def _iter_feature_rows(
+    files: List[Tuple[str, str]], labels: Dict[str, str]
+) -> Iterator[Tuple[str | int, ...]]:
+    paths = [path for _, path in files]
+    executor = ProcessPoolExecutor() if len(paths) > PARALLEL_MIN_FILES else None
+    try:
+        if executor is not None:
+            counts_iter = executor.map(parse_strace_file, paths, chunksize=16)
+        else:
+            counts_iter = map(parse_strace_file, paths)
+        for (file_id, _), counts in zip(files, counts_iter):
+            yield (
+                file_id,
+                labels[file_id],
+                *(counts[column] for column in FEATURE_COLUMNS),
+            )
+    finally:
+        # A consumer that stops early (e.g. a failed CSV write) should not
+        # wait for the rest of the dataset to be parsed.
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+
+def write_features_csv(input_dir: Path, labels_path: Path, output_path: Path) -> None:
+    labels = load_labels(labels_path)
+    files = _list_labelled_files(input_dir, labels)
+
+    # Rows stream into a sibling temp file that only replaces the output
+    # once every log has parsed, so a failure midway leaves the previous
+    # features file intact.
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = output_path.with_suffix(output_path.suffix + ".tmp")
+    try:
+        with tmp_path.open("w", encoding="utf-8", newline="") as csvfile:
+            writer = csv.writer(csvfile, lineterminator="\n")
+            writer.writerow(OUTPUT_COLUMNS)
+            writer.writerows(_iter_feature_rows(files, labels))
+        os.replace(tmp_path, output_path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+def extract_features(input_dir: Path, labels_path: Path) -> pd.DataFrame:
+    # Imported here so the CLI and write_features_csv never load pandas.
+    import pandas as pd
+
+    labels = load_labels(labels_path)
+    files = _list_labelled_files(input_dir, labels)
+
+    # Fixed-width record layout sized to the longest id/label, so the
+    # frame is built from a single typed allocation with no inference.
+    record_dtype = [
+        ("id", f"U{max(len(file_id) for file_id, _ in files)}"),
+        ("label", f"U{max(len(labels[file_id]) for file_id, _ in files)}"),
+    ] + [(column, np.uint32) for column in FEATURE_COLUMNS]
+    records = np.empty(len(files), dtype=record_dtype)
+    for i, row in enumerate(_iter_feature_rows(files, labels)):
+        records[i] = row
+
+    # Rows already come out sorted by id, so no sort_values pass.
+    return pd.DataFrame(records).astype(COLUMN_DTYPES)
 
 
 def main() -> None:
@@ -166,10 +370,7 @@ def main() -> None:
     if not labels_path.exists():
         raise FileNotFoundError(f"Labels file '{labels_path}' does not exist.")
 
-    df = extract_features(input_dir, labels_path)
-
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    df.to_csv(output_path, index=False)
+    write_features_csv(input_dir, labels_path, output_path)
 
 
 if __name__ == "__main__":
@@ -1,59 +1,105 @@
 from __future__ import annotations
 
 import argparse
+import functools
 import json
 from pathlib import Path
 import sys
 from typing import Dict, List
 
 import joblib
+import numpy as np
 import pandas as pd
 
+try:
+    import pyarrow
+    import pyarrow.csv
+except ImportError:
+    pyarrow = None
+
 ROOT_DIR = Path(__file__).resolve().parents[1]
 if str(ROOT_DIR) not in sys.path:
     sys.path.insert(0, str(ROOT_DIR))
 
-from features.extract_features import parse_strace_file
-
-
-FEATURE_COLUMNS = [
-    "open_count",
-    "read_count",
-    "write_count",
-    "execve_count",
-    "connect_count",
-    "fork_count",
-    "clone_count",
-    "created_count",
-    "deleted_count",
-    "new_process_count",
-]
+from features.extract_features import (
+    COLUMN_DTYPES,
+    FEATURE_COLUMNS,
+    parse_strace_file_vector,
+)
+
+
+@functools.lru_cache(maxsize=2)
+def _load_model_cached(path: str, mtime_ns: int):
+    # No mmap_mode: sklearn copies the tree node arrays on unpickling, so
+    # mapping would share nothing and only hold a descriptor per array.
+    model = joblib.load(path)
+    # The scoring paths pass plain arrays in FEATURE_COLUMNS order, so the
+    # model must have been fitted on exactly those columns in that order.
+    feature_names = list(getattr(model, "feature_names_in_", []))
+    if feature_names != FEATURE_COLUMNS:
+        raise ValueError(
+            f"Model '{path}' was trained on features {feature_names}, "
+            f"expected {FEATURE_COLUMNS}."
+        )
+    return model
 
 
+# Safe to call repeatedly from a long-lived server: loads are cached per
+# (path, mtime), so a retrained model is picked up on the next call.
 def load_model(path: Path):
     if not path.exists():
         raise FileNotFoundError(f"Model file '{path}' not found.")
-    return joblib.load(path)
+    return _load_model_cached(str(path.resolve()), path.stat().st_mtime_ns)
+
+
+# Parsed as text on either engine, so an id like "007" keeps its zeros.
+_TEXT_COLUMNS = ("id", "label")
+
+
+def _read_features_csv(path: Path) -> pd.DataFrame:
+    if pyarrow is not None:
+        convert_options = pyarrow.csv.ConvertOptions(
+            column_types={column: pyarrow.string() for column in _TEXT_COLUMNS}
+        )
+        table = pyarrow.csv.read_csv(str(path), convert_options=convert_options)
+        return table.to_pandas()
+    return pd.read_csv(
+        path, dtype={column: COLUMN_DTYPES[column] for column in _TEXT_COLUMNS}
+    )
+
+
+def _check_feature_counts(df: pd.DataFrame, path: Path) -> None:
+    # Counts are inferred rather than forced to uint32, so bad input is
+    # rejected here instead of wrapping or truncating differently per engine.
+    if df.empty:
+        return
+    for column in FEATURE_COLUMNS:
+        if column not in df.columns:
+            continue
+        values = df[column]
+        if values.isna().any():
+            problem = "missing values"
+        elif pd.api.types.is_bool_dtype(values) or not pd.api.types.is_numeric_dtype(
+            values
+        ):
+            problem = "non-numeric values"
+        elif ((values < 0) | (values % 1 != 0)).any():
+            problem = "negative or fractional counts"
+        else:
+            continue
+        raise ValueError(f"Features file '{path}' has {problem} in '{column}'.")
 
 
 def load_features(path: Path) -> pd.DataFrame:
     if not path.exists():
         raise FileNotFoundError(f"Features file '{path}' not found.")
-    df = pd.read_csv(path)
+    df = _read_features_csv(path)
+    _check_feature_counts(df, path)
     if "id" not in df.columns:
         df["id"] = [f"sample_{i}" for i in range(len(df))]
     return df
 
 
-def extract_features_from_log(log_path: Path) -> pd.DataFrame:
-    if not log_path.exists():
-        raise FileNotFoundError(f"Log file '{log_path}' not found.")
-    counts = parse_strace_file(log_path)
-    data = {col: counts.get(col, 0) for col in FEATURE_COLUMNS}
-    data["id"] = log_path.stem
-    return pd.DataFrame([data])
-
-
 def _prepare_features(df: pd.DataFrame) -> pd.DataFrame:
     missing_cols = [col for col in FEATURE_COLUMNS if col not in df.columns]
     if missing_cols:
@@ -69,27 +115,39 @@ def _prepare_features(df: pd.DataFrame) -> pd.DataFrame:
     return df[existing_cols]
 
 
-def predict_single(
-    model, row: pd.Series, feature_columns: List[str]
-) -> Dict[str, str | float]:
+def _malicious_proba(model, X: np.ndarray) -> np.ndarray:
     malicious_index = list(model.classes_).index("malicious")
-    proba = model.predict_proba(row[feature_columns].to_frame().T)[0][malicious_index]
+    return model.predict_proba(X)[:, malicious_index]
+
+
+def _format_result(sample_id: str, proba: float) -> Dict[str, str | float]:
     verdict = "malicious" if proba > 0.5 else "benign"
     result_type = "malware" if verdict == "malicious" else "clean"
     return {
-        "id": str(row.get("id", "sample")),
+        "id": str(sample_id),
         "verdict": verdict,
         "type": result_type,
         "confidence": round(float(proba), 4),
     }
 
 
+def predict_single(
+    model, row: pd.Series, feature_columns: List[str]
+) -> Dict[str, str | float]:
+    X = row[feature_columns].to_numpy(dtype=np.float32).reshape(1, -1)
+    return _format_result(row.get("id", "sample"), _malicious_proba(model, X)[0])
+
+
 def predict_batch(model, df: pd.DataFrame) -> List[Dict[str, str | float]]:
-    feature_columns = FEATURE_COLUMNS
-    results = []
-    for _, row in df.iterrows():
-        results.append(predict_single(model, row, feature_columns))
-    return results
+    # predict_proba rejects a zero-row array; a header-only CSV scores as [].
+    if df.empty:
+        return []
+    X = df[FEATURE_COLUMNS].to_numpy(dtype=np.float32)
+    probas = _malicious_proba(model, X)
+    return [
+        _format_result(sample_id, proba)
+        for sample_id, proba in zip(df["id"].to_numpy(), probas)
+    ]
 
 
 def parse_args() -> argparse.Namespace:
@@ -123,14 +181,17 @@ def main() -> None:
     model = load_model(args.model)
 
     if args.features:
-        df = load_features(args.features)
+        df = _prepare_features(load_features(args.features))
+        results = predict_batch(model, df)
+        output = results[0] if len(results) == 1 else results
     else:
-        df = extract_features_from_log(args.log)
-
-    df = _prepare_features(df)
-    results = predict_batch(model, df)
+        # A single log is parsed straight into a feature vector; a one-row
+        # DataFrame would cost more than the inference itself.
+        if not args.log.exists():
+            raise FileNotFoundError(f"Log file '{args.log}' not found.")
+        X = parse_strace_file_vector(args.log).reshape(1, -1)
+        output = _format_result(args.log.stem, _malicious_proba(model, X)[0])
 
-    output = results[0] if len(results) == 1 else results
     print(json.dumps(output, indent=4))
 
 
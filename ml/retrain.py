@@ -33,9 +33,18 @@ if str(ROOT_DIR) not in sys.path:
     sys.path.insert(0, str(ROOT_DIR))
 
 try:
-    from features.extract_features import extract_features as extract_features_lib
+    from features.extract_features import write_features_csv as write_features_lib
 except ImportError:
-    extract_features_lib = None
+    write_features_lib = None
+
+
+MANIFEST_FIELDS = [
+    "timestamp",
+    "model_filename",
+    "metrics_filename",
+    "features_sha256",
+    "notes",
+]
 
 
 def log(message: str, verbose: bool = False) -> None:
@@ -46,11 +55,14 @@ def log(message: str, verbose: bool = False) -> None:
 
 def compute_sha256(path: Path) -> str:
     """Compute SHA-256 hash of a file."""
-    sha256 = hashlib.sha256()
     with path.open("rb") as f:
-        for chunk in iter(lambda: f.read(4096), b""):
+        if hasattr(hashlib, "file_digest"):
+            return hashlib.file_digest(f, "sha256").hexdigest()
+        # Python < 3.11: large chunks keep the per-read loop overhead low.
+        sha256 = hashlib.sha256()
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
             sha256.update(chunk)
-    return sha256.hexdigest()
+        return sha256.hexdigest()
 
 
 def check_safety_requirements(
@@ -132,10 +144,10 @@ def regenerate_features(
     log(f"Regenerating features from '{dataset_dir}'...", verbose=verbose)
 
     if dry_run:
-        if extract_features_lib:
+        if write_features_lib:
             print(
-                f"[DRY-RUN] Would call extract_features({dataset_dir}, {labels_path}) "
-                f"and save to {features_out}",
+                f"[DRY-RUN] Would call write_features_csv({dataset_dir}, {labels_path}, "
+                f"{features_out})",
                 file=sys.stderr,
             )
         else:
@@ -153,13 +165,10 @@ def regenerate_features(
         return
 
     # Try to use library function first
-    if extract_features_lib:
+    if write_features_lib:
         try:
-            import pandas as pd
-
-            df = extract_features_lib(dataset_dir, labels_path)
-            features_out.parent.mkdir(parents=True, exist_ok=True)
-            df.to_csv(features_out, index=False)
+            # Streams rows straight to the CSV; no DataFrame is built.
+            write_features_lib(dataset_dir, labels_path, features_out)
             log(f"Features regenerated using library function: {features_out}", verbose=verbose)
             return
         except Exception as e:
@@ -251,23 +260,21 @@ def retrain_model(
         str(metrics_path),
     ]
 
-    result = subprocess.run(
-        cmd, capture_output=True, text=True, cwd=ROOT_DIR
-    )
-
-    # Save log
+    # Stream the child's output straight into the log file rather than
+    # buffering it in memory; stderr shares the handle so ordering is kept.
     with log_path.open("w", encoding="utf-8") as f:
-        f.write(f"Command: {' '.join(cmd)}\n")
-        f.write(f"Return code: {result.returncode}\n")
-        f.write(f"\n--- STDOUT ---\n{result.stdout}\n")
-        f.write(f"\n--- STDERR ---\n{result.stderr}\n")
+        f.write(f"Command: {' '.join(cmd)}\n\n--- OUTPUT ---\n")
+        f.flush()
+        proc = subprocess.Popen(cmd, stdout=f, stderr=subprocess.STDOUT, cwd=ROOT_DIR)
+        returncode = proc.wait()
+        f.write(f"\nReturn code: {returncode}\n")
 
-    if result.returncode != 0:
+    if returncode != 0:
         print(
             json.dumps(
                 {
                     "status": "error",
-                    "message": f"Training failed (return code {result.returncode})",
+                    "message": f"Training failed (return code {returncode})",
                     "log_path": str(log_path),
                 }
             ),
@@ -291,20 +298,29 @@ def promote_model(
 ) -> None:
     """
     Promote the new model to be the stable alias.
-    Creates a copy (not symlink) for cross-platform compatibility.
+    Hard-links the alias when possible (no symlink, for cross-platform
+    compatibility), falling back to a copy across filesystems.
     """
     log(f"Promoting model to stable alias: {model_alias}", verbose=verbose)
 
     if dry_run:
         print(
-            f"[DRY-RUN] Would copy {model_path} to {model_alias}",
+            f"[DRY-RUN] Would link {model_path} to {model_alias}",
             file=sys.stderr,
         )
         return
 
-    # Copy model to alias (ensuring parent directory exists)
+    # Stage the alias next to its final name (ensuring parent directory
+    # exists), then swap it in atomically so readers never see it missing.
     model_alias.parent.mkdir(parents=True, exist_ok=True)
-    shutil.copy2(model_path, model_alias)
+    tmp_alias = model_alias.with_suffix(model_alias.suffix + ".tmp")
+    tmp_alias.unlink(missing_ok=True)
+    try:
+        os.link(model_path, tmp_alias)
+    except OSError:
+        # Cross-device or no hard-link support: fall back to a full copy.
+        shutil.copy2(model_path, tmp_alias)
+    os.replace(tmp_alias, model_alias)
     log(f"Model alias updated: {model_alias} -> {model_path}", verbose=verbose)
 
 
@@ -340,21 +356,39 @@ def update_manifest(
     # Create manifest if it doesn't exist
     file_exists = manifest_path.exists()
     with manifest_path.open("a", encoding="utf-8", newline="") as f:
-        writer = csv.DictWriter(
-            f,
-            fieldnames=[
-                "timestamp",
-                "model_filename",
-                "metrics_filename",
-                "features_sha256",
-                "notes",
-            ],
-        )
+        writer = csv.DictWriter(f, fieldnames=MANIFEST_FIELDS)
         if not file_exists:
             writer.writeheader()
         writer.writerow(entry)
 
 
+def _scan_model_dir(model_dir: Path, metrics_dir: Path) -> Dict[str, Dict[str, Path]]:
+    """
+    Index versioned artifacts by their filename timestamp.
+    Returns {timestamp: {"model" | "metrics" | "log": path}} for the files
+    that exist, using a single os.scandir pass per directory.
+    """
+    layout = [
+        (model_dir, [("model", "model_rf_", ".pkl"), ("log", "retrain_", ".log")]),
+        (metrics_dir, [("metrics", "metrics_", ".png")]),
+    ]
+    artifacts: Dict[str, Dict[str, Path]] = {}
+    for directory, kinds in layout:
+        if not directory.is_dir():
+            continue
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                for kind, prefix, suffix in kinds:
+                    if (
+                        entry.name.startswith(prefix)
+                        and entry.name.endswith(suffix)
+                        and entry.is_file()
+                    ):
+                        timestamp = entry.name[len(prefix) : -len(suffix)]
+                        artifacts.setdefault(timestamp, {})[kind] = Path(entry.path)
+    return artifacts
+
+
 def cleanup_old_models(
     model_dir: Path,
     metrics_dir: Path,
@@ -368,86 +402,67 @@ def cleanup_old_models(
     """
     log(f"Cleaning up old models (keeping latest {n_keep})...", verbose=verbose)
 
-    # Find all model files
-    model_files = sorted(
-        model_dir.glob("model_rf_*.pkl"), key=lambda p: p.stat().st_mtime, reverse=True
+    artifacts = _scan_model_dir(model_dir, metrics_dir)
+
+    # Model timestamps, newest first. The YYYYMMDD_HHMMSS format sorts
+    # chronologically as a string, so no stat() needed.
+    model_timestamps = sorted(
+        (ts for ts, found in artifacts.items() if "model" in found), reverse=True
     )
 
-    if len(model_files) <= n_keep:
-        log(f"Only {len(model_files)} models found, no cleanup needed.", verbose=verbose)
+    if len(model_timestamps) <= n_keep:
+        log(
+            f"Only {len(model_timestamps)} models found, no cleanup needed.",
+            verbose=verbose,
+        )
         return
 
-    # Files to delete (older than n_keep)
-    to_delete = model_files[n_keep:]
-
-    for model_file in to_delete:
-        # Extract timestamp from filename
-        timestamp = model_file.stem.replace("model_rf_", "")
-        metrics_file = metrics_dir / f"metrics_{timestamp}.png"
-        log_file = model_dir / f"retrain_{timestamp}.log"
+    # Timestamps to delete (older than n_keep)
+    to_delete = model_timestamps[n_keep:]
 
+    for timestamp in to_delete:
+        found = artifacts[timestamp]
         if dry_run:
-            print(f"[DRY-RUN] Would delete: {model_file}", file=sys.stderr)
-            if metrics_file.exists():
-                print(f"[DRY-RUN] Would delete: {metrics_file}", file=sys.stderr)
-            if log_file.exists():
-                print(f"[DRY-RUN] Would delete: {log_file}", file=sys.stderr)
+            for kind in ("model", "metrics", "log"):
+                if kind in found:
+                    print(f"[DRY-RUN] Would delete: {found[kind]}", file=sys.stderr)
         else:
-            if model_file.exists():
-                model_file.unlink()
-                log(f"Deleted old model: {model_file}", verbose=verbose)
-            if metrics_file.exists():
-                metrics_file.unlink()
-                log(f"Deleted old metrics: {metrics_file}", verbose=verbose)
-            if log_file.exists():
-                log_file.unlink()
-                log(f"Deleted old log: {log_file}", verbose=verbose)
+            for kind in ("model", "metrics", "log"):
+                if kind in found:
+                    found[kind].unlink(missing_ok=True)
+                    log(f"Deleted old {kind}: {found[kind]}", verbose=verbose)
 
     # Clean up manifest entries (remove rows for deleted models)
     manifest_path = model_dir / "manifest.csv"
     if manifest_path.exists() and not dry_run:
-        # Read all entries
-        entries = []
-        with manifest_path.open("r", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            entries = list(reader)
-
-        # Filter out entries for deleted models
-        deleted_timestamps = {f.stem.replace("model_rf_", "") for f in to_delete}
-        kept_entries = [
-            e for e in entries if e["timestamp"] not in deleted_timestamps
-        ]
-
-        # Rewrite manifest
-        with manifest_path.open("w", encoding="utf-8", newline="") as f:
-            if kept_entries:
-                writer = csv.DictWriter(
-                    f,
-                    fieldnames=[
-                        "timestamp",
-                        "model_filename",
-                        "metrics_filename",
-                        "features_sha256",
-                        "notes",
-                    ],
-                )
-                writer.writeheader()
-                writer.writerows(kept_entries)
-            # If no entries left, just write header (or leave empty)
-            elif entries:
-                writer = csv.DictWriter(
-                    f,
-                    fieldnames=[
-                        "timestamp",
-                        "model_filename",
-                        "metrics_filename",
-                        "features_sha256",
-                        "notes",
-                    ],
-                )
-                writer.writeheader()
-
-        log(f"Cleaned up manifest entries.", verbose=verbose)
+        # Manifest rows carry ISO timestamps, so match on the model filename
+        # (older rows may still use the filename-style timestamp).
+        deleted_filenames = {artifacts[ts]["model"].name for ts in to_delete}
+        deleted_timestamps = set(to_delete)
+
+        # Stream the kept rows into a temp file and swap it in, but only if
+        # something was actually dropped.
+        tmp_path = manifest_path.with_suffix(".csv.tmp")
+        removed = 0
+        with manifest_path.open("r", encoding="utf-8") as src, tmp_path.open(
+            "w", encoding="utf-8", newline=""
+        ) as dst:
+            writer = csv.DictWriter(dst, fieldnames=MANIFEST_FIELDS)
+            writer.writeheader()
+            for entry in csv.DictReader(src):
+                if (
+                    entry["model_filename"] in deleted_filenames
+                    or entry["timestamp"] in deleted_timestamps
+                ):
+                    removed += 1
+                    continue
+                writer.writerow(entry)
+
+        if removed:
+            os.replace(tmp_path, manifest_path)
+            log(f"Removed {removed} manifest entries.", verbose=verbose)
+        else:
+            tmp_path.unlink()
 
 
 def parse_args() -> argparse.Namespace:
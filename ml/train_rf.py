@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import argparse
+import os
 from pathlib import Path
 from typing import Tuple
 
@@ -55,7 +56,15 @@ def train_model(df: pd.DataFrame) -> Tuple[RandomForestClassifier, pd.DataFrame,
 
 def save_model(model: RandomForestClassifier, path: Path) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
-    joblib.dump(model, path)
+    # Dump beside the target and swap it in: retrain.py hard-links the
+    # stable alias to a versioned model, so writing in place would rewrite
+    # that archived copy too.
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    try:
+        joblib.dump(model, tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
 
 
 def save_metrics(conf_matrix_df: pd.DataFrame, accuracy: float, path: Path) -> None:
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import io
+from pathlib import Path
+import sys
+from typing import Dict
+
+import pytest
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from features import extract_features
+from features.extract_features import BUCKET_KEYWORDS, parse_strace_file
+
+
+LOGS = {
+    "cr_line_endings": b'open("/a")\rread(3)\r# write(1)\rexecve("/bin/sh")',
+    "crlf_line_endings": b'unlink("/x")\r\nunlink("/y")\r\n\r\nfork()\r\n',
+    "mixed_line_endings": b"clone()\r\nclone()\rconnect(4)\nmkdir(\"/d\")\r",
+    "unicode_space_comments": (
+        "\u00a0# open(x)\n\u3000#read(3)\n\u2003\t# unlink(y)\n"
+        "\u00a0open(z)\nwrite(1) # not a comment\n"
+    ).encode("utf-8"),
+    "unlinkat_readlink_overlaps": (
+        b'unlinkat(3, "f", 0)\nreadlink("/proc/self/exe")\n'
+        b'symlink("a", "b")\nmkfifopen\nreadeleted\n'
+    ),
+    "several_keywords_per_line": (
+        b"open read write execve connect fork clone\n"
+        b'OPEN("/tmp/x") = 3; Read(3); unlink; remove; deleted; rmdir\n'
+        b"creat create creat mkdir mknod touch link\n"
+    ),
+}
+
+
+def _reference_counts(data: bytes) -> Dict[str, int]:
+    # The original per-line parser: text-mode line splitting, strip, skip
+    # blanks and comments, then a substring test per bucket.
+    counts = dict.fromkeys(BUCKET_KEYWORDS, 0)
+    for raw_line in io.StringIO(data.decode("utf-8"), newline=None):
+        line = raw_line.strip()
+        if not line or line.startswith("#"):
+            continue
+        line_lower = line.lower()
+        for key, keywords in BUCKET_KEYWORDS.items():
+            if any(keyword in line_lower for keyword in keywords):
+                counts[key] += 1
+    counts["new_process_count"] = counts["fork_count"] + counts["clone_count"]
+    return counts
+
+
+@pytest.fixture(params=sorted(LOGS))
+def log_path(request, tmp_path: Path) -> Path:
+    path = tmp_path / f"{request.param}.strace"
+    path.write_bytes(LOGS[request.param])
+    return path
+
+
+def test_regex_scan_matches_reference(log_path: Path, monkeypatch) -> None:
+    monkeypatch.setattr(extract_features, "_AUTOMATON", None)
+    assert parse_strace_file(log_path) == _reference_counts(log_path.read_bytes())
+
+
+def test_automaton_scan_matches_regex_scan(log_path: Path, monkeypatch) -> None:
+    if extract_features._AUTOMATON is None:
+        pytest.skip("pyahocorasick is not installed")
+    automaton_counts = parse_strace_file(log_path)
+    monkeypatch.setattr(extract_features, "_AUTOMATON", None)
+    regex_counts = parse_strace_file(log_path)
+    assert automaton_counts == regex_counts == _reference_counts(log_path.read_bytes())